@@ -1,51 +1,43 @@
 from dataclasses import dataclass
-from typing import Iterator, List
+from typing import Iterator, List, Tuple
 
 START_CODE_3 = b"\x00\x00\x01"
-START_CODE_4 = b"\x00\x00\x00\x01"
 
 
-@dataclass
+@dataclass(slots=True)
 class NALUnit:
     nal_ref_idc: int
     nal_unit_type: int
-    payload: bytes
-
-
-def find_start_codes(data: bytes) -> List[int]:
-    positions = []
-    i = 0
-    while i < len(data) - 3:
-        if data[i:i+4] == START_CODE_4:
-            positions.append(i)
-            i += 4
-        elif data[i:i+3] == START_CODE_3:
-            positions.append(i)
-            i += 3
+    payload: memoryview  # zero-copy view into the parsed buffer
+
+
+def find_start_codes(data: bytes) -> List[Tuple[int, int]]:
+    positions: List[Tuple[int, int]] = []
+    # Hoisted bound methods: the per-match cost is all interpreter overhead
+    find = data.find
+    append = positions.append
+    i = find(START_CODE_3)
+    while i >= 0:
+        # 00 00 01 preceded by a zero byte is a 4-byte start code
+        if i and not data[i-1]:
+            append((i - 1, 4))
         else:
-            i += 1
+            append((i, 3))
+        i = find(START_CODE_3, i + 3)
     return positions
 
 
 def parse_annexb(data: bytes) -> Iterator[NALUnit]:
+    mv = memoryview(data)
     starts = find_start_codes(data)
-    starts.append(len(data))  # sentinel
-
-    for i in range(len(starts) - 1):
-        start = starts[i]
-
-        # Skip start code
-        if data[start:start+4] == START_CODE_4:
-            nal_start = start + 4
-        else:
-            nal_start = start + 3
+    starts.append((len(data), 0))  # sentinel
 
-        nal_end = starts[i + 1]
-        nal = data[nal_start:nal_end]
-        if not nal:
+    for (start, code_len), (nal_end, _) in zip(starts, starts[1:]):
+        nal_start = start + code_len
+        if nal_start >= nal_end:
             continue
 
-        header = nal[0]
+        header = data[nal_start]
         forbidden_zero_bit = (header >> 7) & 1
         if forbidden_zero_bit != 0:
             raise ValueError("Invalid NAL (forbidden_zero_bit set)")
@@ -56,7 +48,7 @@ def parse_annexb(data: bytes) -> Iterator[NALUnit]:
         yield NALUnit(
             nal_ref_idc=nal_ref_idc,
             nal_unit_type=nal_unit_type,
-            payload=nal[1:],
+            payload=mv[nal_start+1:nal_end],
         )
 
 def main() -> None:
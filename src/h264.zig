@@ -1,4 +1,5 @@
 const std = @import("std");
+const builtin = @import("builtin");
 const mem = std.mem;
 const Io = std.Io;
 
@@ -45,6 +46,72 @@ pub const StartCode4 = enum(u32) {
     }
 };
 
+/// Bytes compared per SIMD step: 32 with AVX2, 16 with SSE2 or NEON.
+const vector_len = std.simd.suggestVectorLength(u8) orelse 16;
+const ByteVec = @Vector(vector_len, u8);
+
+/// NEON has no movemask, so on aarch64 each byte gets a nibble in the mask
+/// (the shrn #4 narrowing trick) instead of a single bit.
+const use_nibble_mask = builtin.cpu.arch == .aarch64 and vector_len == 16;
+const zero_mask_stride = if (use_nibble_mask) 4 else 1;
+const ZeroMask = std.meta.Int(.unsigned, vector_len * zero_mask_stride);
+
+/// One set bit per zero byte of `chunk`, at bit `lane * zero_mask_stride`
+/// (plus 3 for nibble masks).
+fn zeroMask(chunk: ByteVec) ZeroMask {
+    if (use_nibble_mask) return nibbleZeroMask(chunk);
+    const zero: ByteVec = @splat(0);
+    return @bitCast(chunk == zero);
+}
+
+/// Bit `4 * lane + 3` is set for every zero byte of `chunk`. Lowers to
+/// cmeq + shrn #4 on NEON but builds on any target, so it is tested everywhere.
+fn nibbleZeroMask(chunk: @Vector(16, u8)) u64 {
+    const zero: @Vector(16, u8) = @splat(0);
+    const eq = @select(u8, chunk == zero, @as(@Vector(16, u8), @splat(0xff)), zero);
+    const wide: @Vector(8, u16) = @bitCast(eq);
+    const nibbles: @Vector(8, u8) = @truncate(wide >> @as(@Vector(8, u4), @splat(4)));
+    return @as(u64, @bitCast(nibbles)) & 0x8888888888888888;
+}
+
+/// Returns the offset of the first 3 or 4 byte start code in `bytes`, if any.
+/// Zero bytes are located `vector_len` bytes at a time with a vector compare
+/// turned into a bitmask, only those offsets get the exact start code check.
+/// The tail is scanned with the SWAR has-zero test on 64-bit words.
+pub fn findStartCode(bytes: []const u8) ?usize {
+    var i: usize = 0;
+    while (i + vector_len <= bytes.len) : (i += vector_len) {
+        const chunk: ByteVec = bytes[i..][0..vector_len].*;
+        var zeros = zeroMask(chunk);
+        while (zeros != 0) : (zeros &= zeros - 1) {
+            const candidate = i + @ctz(zeros) / zero_mask_stride;
+            if (StartCode4.isStartCode4(bytes[candidate..])) return candidate;
+            if (StartCode3.isStartCode(bytes[candidate..])) return candidate;
+        }
+    }
+
+    const lo: u64 = 0x0101010101010101;
+    const hi: u64 = 0x8080808080808080;
+
+    while (i + 3 <= bytes.len) {
+        if (i + 8 <= bytes.len) {
+            const word = mem.readInt(u64, bytes[i..][0..8], .little);
+            const zeros = (word -% lo) & ~word & hi;
+            if (zeros == 0) {
+                i += 8;
+                continue;
+            }
+            // lowest flagged byte is always a real zero, jump straight to it
+            i += @ctz(zeros) >> 3;
+        }
+
+        if (StartCode4.isStartCode4(bytes[i..])) return i;
+        if (StartCode3.isStartCode(bytes[i..])) return i;
+        i += 1;
+    }
+    return null;
+}
+
 pub const Parser = struct {
     source: *Io.Reader,
     position: u64,
@@ -73,25 +140,27 @@ pub const Parser = struct {
 
     fn skipToStartCode(self: *Parser) !?void {
         while (true) {
-            const peeked = self.source.peek(4) catch |err| switch (err) {
+            const peeked = self.source.peekGreedy(4) catch |err| switch (err) {
                 error.EndOfStream => return null,
                 else => return err,
             };
 
-            if (peeked.len >= 4 and StartCode4.isStartCode4(peeked[0..4])) {
-                self.source.toss(4);
-                self.position += 4;
+            // leave the last byte out so a match is always followed by a header byte
+            if (findStartCode(peeked[0 .. peeked.len - 1])) |i| {
+                const code_len: usize = if (StartCode4.isStartCode4(peeked[i..])) 4 else 3;
+                self.source.toss(i + code_len);
+                self.position += i + code_len;
                 return;
             }
 
-            if (peeked.len >= 3 and StartCode3.isStartCode(peeked[0..3])) {
-                self.source.toss(3);
-                self.position += 3;
-                return;
-            }
+            const safe_len = peeked.len - 3;
+            self.source.toss(safe_len);
+            self.position += safe_len;
 
-            self.source.toss(1);
-            self.position += 1;
+            self.source.fillMore() catch |err| switch (err) {
+                error.EndOfStream => return null,
+                else => return err,
+            };
         }
     }
 
@@ -112,21 +181,11 @@ pub const Parser = struct {
 
             iteration += 1;
 
-            var i: usize = 0;
-            while (i < peeked.len) : (i += 1) {
-                if (i + 4 <= peeked.len and StartCode4.isStartCode4(peeked[i .. i + 4])) {
-                    const end_pos = self.position + i;
-                    self.source.toss(i);
-                    self.position = end_pos;
-                    return end_pos;
-                }
-
-                if (i + 3 <= peeked.len and StartCode3.isStartCode(peeked[i .. i + 3])) {
-                    const end_pos = self.position + i;
-                    self.source.toss(i);
-                    self.position = end_pos;
-                    return end_pos;
-                }
+            if (findStartCode(peeked)) |i| {
+                const end_pos = self.position + i;
+                self.source.toss(i);
+                self.position = end_pos;
+                return end_pos;
             }
 
             const safe_len = if (peeked.len > 3) peeked.len - 3 else 0;
@@ -239,3 +298,85 @@ pub const Nal = struct {
         return self.end_off -| self.start_off;
     }
 };
+
+fn findStartCodeScalar(bytes: []const u8) ?usize {
+    var i: usize = 0;
+    while (i + 3 <= bytes.len) : (i += 1) {
+        if (StartCode4.isStartCode4(bytes[i..])) return i;
+        if (StartCode3.isStartCode(bytes[i..])) return i;
+    }
+    return null;
+}
+
+test "findStartCode finds a start code at every offset and input length" {
+    const codes = [_][]const u8{ &.{ 0, 0, 1 }, &.{ 0, 0, 0, 1 } };
+    // covers inputs shorter than 3, 8 and vector_len bytes, codes straddling
+    // every vector boundary and codes that only the SWAR tail reaches
+    var buf: [3 * vector_len + 16]u8 = undefined;
+    for (codes) |code| {
+        for (0..buf.len) |pos| {
+            @memset(&buf, 0xaa);
+            const n = @min(code.len, buf.len - pos);
+            @memcpy(buf[pos..][0..n], code[0..n]);
+            for (0..buf.len + 1) |len| {
+                const input = buf[0..len];
+                const expected: ?usize = if (pos + code.len <= len) pos else null;
+                try std.testing.expectEqual(expected, findStartCodeScalar(input));
+                try std.testing.expectEqual(expected, findStartCode(input));
+            }
+        }
+    }
+}
+
+test "zeroMask maps each zero lane back to its byte offset" {
+    for (0..vector_len) |lane| {
+        var bytes: [vector_len]u8 = @splat(0xaa);
+        bytes[lane] = 0;
+        const zeros = zeroMask(bytes);
+        try std.testing.expectEqual(@as(u64, 1), @popCount(zeros));
+        try std.testing.expectEqual(lane, @ctz(zeros) / zero_mask_stride);
+    }
+}
+
+test "nibbleZeroMask puts one bit per zero lane at 4 * lane + 3" {
+    for (0..16) |lane| {
+        var bytes: [16]u8 = @splat(0x10);
+        bytes[lane] = 0;
+        const zeros = nibbleZeroMask(bytes);
+        try std.testing.expectEqual(@as(u64, 1) << @intCast(4 * lane + 3), zeros);
+        try std.testing.expectEqual(lane, @ctz(zeros) / 4);
+    }
+
+    var prng = std.Random.DefaultPrng.init(0x0eef);
+    const random = prng.random();
+    for (0..500) |_| {
+        var bytes: [16]u8 = undefined;
+        var expected: u64 = 0;
+        for (&bytes, 0..) |*b, lane| {
+            b.* = if (random.boolean()) 0 else random.intRangeAtMost(u8, 1, 255);
+            if (b.* == 0) expected |= @as(u64, 1) << @intCast(4 * lane + 3);
+        }
+        try std.testing.expectEqual(expected, nibbleZeroMask(bytes));
+    }
+}
+
+test "findStartCode reports the first byte of a 4 byte start code" {
+    try std.testing.expectEqual(@as(?usize, 2), findStartCode(&.{ 7, 7, 0, 0, 0, 1, 0x65 }));
+    try std.testing.expectEqual(@as(?usize, 3), findStartCode(&.{ 7, 7, 7, 0, 0, 1, 0x65 }));
+    // leading zero bytes before 00 00 00 01 belong to the previous NAL
+    try std.testing.expectEqual(@as(?usize, 1), findStartCode(&.{ 0, 0, 0, 0, 1, 0x65 }));
+}
+
+test "findStartCode matches a scalar scan on zero heavy data" {
+    var prng = std.Random.DefaultPrng.init(0x5eed);
+    const random = prng.random();
+    const alphabet = [_]u8{ 0, 0, 0, 1, 2, 0x65 };
+    var buf: [4 * vector_len + 37]u8 = undefined;
+    for (0..2000) |_| {
+        for (&buf) |*b| b.* = alphabet[random.uintLessThan(usize, alphabet.len)];
+        const start = random.uintLessThan(usize, buf.len);
+        const end = start + random.uintLessThan(usize, buf.len - start + 1);
+        const input = buf[start..end];
+        try std.testing.expectEqual(findStartCodeScalar(input), findStartCode(input));
+    }
+}
@@ -174,3 +174,7 @@ pub fn main() !void {
     log.debug("[Pipeline] All stages completed successfully in {d}ms", .{elapsed_ms});
     log.info("\nProcessing completed in {}ms\n", .{elapsed_ms});
 }
+
+test {
+    _ = @import("h264.zig");
+}
@@ -1,71 +1,322 @@
 #!/usr/bin/env python3
 import argparse
+import ctypes
+import errno
 import hashlib
+import mmap
 import os
+import select
 import socket
 import struct
 import sys
 import time
+from functools import partial
 
 DEFAULT_PORT = 5004
 DEFAULT_OUT = "dump.h264"
+WRITE_CHUNK = 256 * 1024
+HASH_CHUNK = 8 * 1024 * 1024
+RECV_BATCH = 64
+RECV_SIZE = 65536
+URING_ENTRIES = 64
+URING_BUF_GROUP = 0
+
+IORING_SETUP_COOP_TASKRUN = 1 << 8
+IORING_SETUP_SINGLE_ISSUER = 1 << 12
+IORING_SETUP_DEFER_TASKRUN = 1 << 13
+IOSQE_BUFFER_SELECT = 1 << 5
+IORING_CQE_F_BUFFER = 1 << 0
+IORING_CQE_F_MORE = 1 << 1
+IORING_CQE_BUFFER_SHIFT = 16
+SQE_BUF_GROUP_OFFSET = 40  # offsetof(struct io_uring_sqe, buf_group), fixed by the kernel ABI
 
 START_CODE_3 = b"\x00\x00\x01"
 START_CODE_4 = b"\x00\x00\x00\x01"
 
+_RTP_HDR = struct.Struct(">BBHII")
+_U16 = struct.Struct(">H")
+
+
+class _IoVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_IoVec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", ctypes.c_uint)]
+
+
+class _IoUringParams(ctypes.Structure):
+    _fields_ = [
+        ("sq_entries", ctypes.c_uint32),
+        ("cq_entries", ctypes.c_uint32),
+        ("flags", ctypes.c_uint32),
+        ("sq_thread_cpu", ctypes.c_uint32),
+        ("sq_thread_idle", ctypes.c_uint32),
+        ("features", ctypes.c_uint32),
+        ("wq_fd", ctypes.c_uint32),
+        ("resv", ctypes.c_uint32 * 3),
+        ("sq_off", ctypes.c_uint64 * 5),
+        ("cq_off", ctypes.c_uint64 * 5),
+    ]
+
+
+class _IoUringCqe(ctypes.Structure):
+    _fields_ = [("user_data", ctypes.c_uint64), ("res", ctypes.c_int32), ("flags", ctypes.c_uint32)]
+
+
+class _KernelTimespec(ctypes.Structure):
+    _fields_ = [("tv_sec", ctypes.c_int64), ("tv_nsec", ctypes.c_int64)]
+
+
+# struct io_uring is only ever handled through pointers (216 bytes in
+# liburing 2.6), reserve generously
+_IoUring = ctypes.c_uint64 * 64
+
 
 def detect_start_code_len(path):
     with open(path, "rb") as f:
-        data = f.read(1024 * 1024)
-    i = 0
-    while i + 3 < len(data):
-        if data[i : i + 4] == START_CODE_4:
+        if os.fstat(f.fileno()).st_size == 0:
             return 4
-        if data[i : i + 3] == START_CODE_3:
-            return 3
-        i += 1
-    return 4
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            i = data.find(START_CODE_3)
+            if i < 0:
+                return 4
+            return 4 if i > 0 and data[i - 1] == 0 else 3
 
 
 def collect_start_code_lengths(path):
     lengths = []
-    buf = b""
     with open(path, "rb") as f:
-        while True:
-            chunk = f.read(1024 * 1024)
-            if not chunk:
-                break
-            data = buf + chunk
-            i = 0
-            end = len(data) - 4
-            while i <= end:
-                if data[i : i + 4] == START_CODE_4:
-                    lengths.append(4)
-                    i += 4
-                elif data[i : i + 3] == START_CODE_3:
-                    lengths.append(3)
-                    i += 3
-                else:
-                    i += 1
-            buf = data[i:]
-    return lengths
+        if os.fstat(f.fileno()).st_size == 0:
+            return lengths, 4
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            i = data.find(START_CODE_3)
+            while i >= 0:
+                lengths.append(4 if i > 0 and data[i - 1] == 0 else 3)
+                i = data.find(START_CODE_3, i + 3)
+    return lengths, (lengths[0] if lengths else 4)
+
+
+def write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view) :]
+
+
+def load_recvmmsg():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        recvmmsg = ctypes.CDLL(None, use_errno=True).recvmmsg
+    except (OSError, AttributeError):
+        return None
+    recvmmsg.argtypes = [
+        ctypes.c_int,
+        ctypes.POINTER(_MMsgHdr),
+        ctypes.c_uint,
+        ctypes.c_int,
+        ctypes.c_void_p,
+    ]
+    recvmmsg.restype = ctypes.c_int
+    return recvmmsg
+
+
+def make_batch_receiver(sock, timeout):
+    # Returns (recv_batch, close); recv_batch() -> packets received within
+    # timeout (possibly none). Uses recvmmsg to drain up to RECV_BATCH datagrams per syscall on Linux,
+    # one recvfrom per call elsewhere. Packets are views into reused buffers
+    # and are only valid until the next call.
+    recvmmsg = load_recvmmsg()
+    if recvmmsg is None:
+
+        def recv_batch():
+            try:
+                data, _ = sock.recvfrom(RECV_SIZE)
+            except socket.timeout:
+                return ()
+            return (data,)
+
+        return recv_batch, lambda: None
+
+    bufs = [bytearray(RECV_SIZE) for _ in range(RECV_BATCH)]
+    raw = [(ctypes.c_char * RECV_SIZE).from_buffer(buf) for buf in bufs]
+    views = [memoryview(buf) for buf in bufs]
+    iovecs = (_IoVec * RECV_BATCH)()
+    msgs = (_MMsgHdr * RECV_BATCH)()
+    for i in range(RECV_BATCH):
+        iovecs[i].iov_base = ctypes.addressof(raw[i])
+        iovecs[i].iov_len = RECV_SIZE
+        msgs[i].msg_hdr.msg_iov = ctypes.pointer(iovecs[i])
+        msgs[i].msg_hdr.msg_iovlen = 1
+    fd = sock.fileno()
+
+    def recv_batch():
+        if not select.select([sock], [], [], timeout)[0]:
+            return ()
+        count = recvmmsg(fd, msgs, RECV_BATCH, socket.MSG_DONTWAIT, None)
+        if count < 0:
+            err = ctypes.get_errno()
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return ()
+            raise OSError(err, os.strerror(err))
+        return [views[i][: msgs[i].msg_len] for i in range(count)]
+
+    return recv_batch, lambda: None
+
+
+def load_liburing():
+    # liburing-ffi (liburing >= 2.4) exports the inline prep/buf_ring helpers
+    try:
+        lib = ctypes.CDLL("liburing-ffi.so.2")
+    except OSError:
+        return None
+    ring_p = ctypes.c_void_p
+    cqe_pp = ctypes.POINTER(ctypes.POINTER(_IoUringCqe))
+    for name, restype, argtypes in (
+        ("io_uring_queue_init_params", ctypes.c_int, [ctypes.c_uint, ring_p, ctypes.POINTER(_IoUringParams)]),
+        ("io_uring_setup_buf_ring", ctypes.c_void_p, [ring_p, ctypes.c_uint, ctypes.c_int, ctypes.c_uint, ctypes.POINTER(ctypes.c_int)]),
+        ("io_uring_buf_ring_mask", ctypes.c_int, [ctypes.c_uint32]),
+        ("io_uring_buf_ring_add", None, [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_ushort, ctypes.c_int, ctypes.c_int]),
+        ("io_uring_buf_ring_advance", None, [ctypes.c_void_p, ctypes.c_int]),
+        ("io_uring_get_sqe", ctypes.c_void_p, [ring_p]),
+        ("io_uring_prep_recv_multishot", None, [ctypes.c_void_p, ctypes.c_int, ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int]),
+        ("io_uring_sqe_set_flags", None, [ctypes.c_void_p, ctypes.c_uint]),
+        ("io_uring_submit", ctypes.c_int, [ring_p]),
+        ("io_uring_wait_cqe_timeout", ctypes.c_int, [ring_p, cqe_pp, ctypes.POINTER(_KernelTimespec)]),
+        ("io_uring_peek_batch_cqe", ctypes.c_uint, [ring_p, cqe_pp, ctypes.c_uint]),
+        ("io_uring_cq_advance", None, [ring_p, ctypes.c_uint]),
+        ("io_uring_free_buf_ring", ctypes.c_int, [ring_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int]),
+        ("io_uring_queue_exit", None, [ring_p]),
+    ):
+        fn = getattr(lib, name)
+        fn.restype = restype
+        fn.argtypes = argtypes
+    return lib
+
+
+def make_uring_receiver(sock, timeout):
+    # Same contract as make_batch_receiver, backed by an io_uring multishot
+    # recv that picks buffers from a registered buffer ring. Buffers handed
+    # out by one call are given back to the ring at the start of the next.
+    # Returns None when liburing-ffi is not available.
+    lib = load_liburing()
+    if lib is None:
+        return None
+
+    ring = _IoUring()
+    params = _IoUringParams(
+        flags=IORING_SETUP_SINGLE_ISSUER | IORING_SETUP_DEFER_TASKRUN | IORING_SETUP_COOP_TASKRUN
+    )
+    ret = lib.io_uring_queue_init_params(URING_ENTRIES, ring, params)
+    if ret == -errno.EINVAL:
+        # Kernels older than 6.1 lack DEFER_TASKRUN
+        ret = lib.io_uring_queue_init_params(URING_ENTRIES, ring, _IoUringParams())
+    if ret < 0:
+        raise OSError(-ret, f"io_uring_queue_init_params: {os.strerror(-ret)}")
+
+    err = ctypes.c_int(0)
+    buf_ring = lib.io_uring_setup_buf_ring(ring, RECV_BATCH, URING_BUF_GROUP, 0, ctypes.byref(err))
+    if not buf_ring:
+        lib.io_uring_queue_exit(ring)
+        raise OSError(-err.value, f"io_uring_setup_buf_ring: {os.strerror(-err.value)}")
+    mask = lib.io_uring_buf_ring_mask(RECV_BATCH)
+
+    bufs = [bytearray(RECV_SIZE) for _ in range(RECV_BATCH)]
+    raw = [(ctypes.c_char * RECV_SIZE).from_buffer(buf) for buf in bufs]
+    addrs = [ctypes.addressof(r) for r in raw]
+    views = [memoryview(buf) for buf in bufs]
+    for bid, addr in enumerate(addrs):
+        lib.io_uring_buf_ring_add(buf_ring, addr, RECV_SIZE, bid, mask, bid)
+    lib.io_uring_buf_ring_advance(buf_ring, RECV_BATCH)
+
+    fd = sock.fileno()
+    cqes = (ctypes.POINTER(_IoUringCqe) * RECV_BATCH)()
+    cqe = ctypes.POINTER(_IoUringCqe)()
+    ts = _KernelTimespec(int(timeout), int((timeout % 1) * 1e9))
+    in_use = []
+    armed = False
+
+    def arm():
+        sqe = lib.io_uring_get_sqe(ring)
+        lib.io_uring_prep_recv_multishot(sqe, fd, None, 0, 0)
+        lib.io_uring_sqe_set_flags(sqe, IOSQE_BUFFER_SELECT)
+        ctypes.c_uint16.from_address(sqe + SQE_BUF_GROUP_OFFSET).value = URING_BUF_GROUP
+        ret = lib.io_uring_submit(ring)
+        if ret < 0:
+            raise OSError(-ret, f"io_uring_submit: {os.strerror(-ret)}")
+
+    def recv_batch():
+        nonlocal armed
+        if in_use:
+            for i, bid in enumerate(in_use):
+                lib.io_uring_buf_ring_add(buf_ring, addrs[bid], RECV_SIZE, bid, mask, i)
+            lib.io_uring_buf_ring_advance(buf_ring, len(in_use))
+            in_use.clear()
+        if not armed:
+            arm()
+            armed = True
+
+        ret = lib.io_uring_wait_cqe_timeout(ring, ctypes.byref(cqe), ctypes.byref(ts))
+        if ret in (-errno.ETIME, -errno.EINTR):
+            return ()
+        if ret < 0:
+            raise OSError(-ret, f"io_uring_wait_cqe_timeout: {os.strerror(-ret)}")
+
+        count = lib.io_uring_peek_batch_cqe(ring, cqes, RECV_BATCH)
+        packets = []
+        for i in range(count):
+            c = cqes[i].contents
+            if not c.flags & IORING_CQE_F_MORE:
+                # Multishot ended (e.g. ENOBUFS while all buffers were out)
+                armed = False
+            if c.flags & IORING_CQE_F_BUFFER:
+                bid = c.flags >> IORING_CQE_BUFFER_SHIFT
+                in_use.append(bid)
+                if c.res > 0:
+                    packets.append(views[bid][: c.res])
+            elif c.res < 0 and c.res != -errno.ENOBUFS:
+                lib.io_uring_cq_advance(ring, count)
+                raise OSError(-c.res, f"io_uring recv: {os.strerror(-c.res)}")
+        lib.io_uring_cq_advance(ring, count)
+        return packets
+
+    def close():
+        nonlocal buf_ring
+        if buf_ring:
+            lib.io_uring_free_buf_ring(ring, buf_ring, RECV_BATCH, URING_BUF_GROUP)
+            lib.io_uring_queue_exit(ring)
+            buf_ring = None
+
+    return recv_batch, close
 
 
 def hash_file(path):
-    h = hashlib.sha256()
+    h = hashlib.sha256(usedforsecurity=False)
     with open(path, "rb") as f:
-        while True:
-            chunk = f.read(1024 * 1024)
-            if not chunk:
-                break
-            h.update(chunk)
+        if os.fstat(f.fileno()).st_size == 0:
+            return h.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            for off in range(0, len(view), HASH_CHUNK):
+                h.update(view[off : off + HASH_CHUNK])
     return h.hexdigest()
 
 
 def parse_rtp_header(data):
     if len(data) < 12:
         return None
-    b0, b1, seq, ts, ssrc = struct.unpack(">BBHII", data[:12])
+    b0, b1, seq, ts, ssrc = _RTP_HDR.unpack_from(data, 0)
     version = b0 >> 6
     padding = (b0 >> 5) & 1
     extension = (b0 >> 4) & 1
@@ -78,7 +329,7 @@ def parse_rtp_header(data):
     if extension:
         if len(data) < header_len + 4:
             return None
-        ext_len = struct.unpack(">H", data[header_len + 2 : header_len + 4])[0]
+        (ext_len,) = _U16.unpack_from(data, header_len + 2)
         header_len += 4 + ext_len * 4
         if len(data) < header_len:
             return None
@@ -127,15 +378,27 @@ def main():
         default="auto",
         help="Start code length to write into output.",
     )
+    parser.add_argument(
+        "--io-uring",
+        action="store_true",
+        help="Receive with io_uring multishot recv (Linux, needs liburing-ffi).",
+    )
     args = parser.parse_args()
 
-    start_code_len = detect_start_code_len(args.input) if args.start_code == "auto" else int(args.start_code)
-    start_code = START_CODE_4 if start_code_len == 4 else START_CODE_3
     preserve_start_codes = not args.no_preserve_start_codes
-    start_code_seq = collect_start_code_lengths(args.input) if preserve_start_codes else []
-    start_code_index = 0
-    start_code_3_count = sum(1 for x in start_code_seq if x == 3)
-    start_code_4_count = sum(1 for x in start_code_seq if x == 4)
+    if preserve_start_codes:
+        start_code_seq, detected_len = collect_start_code_lengths(args.input)
+    else:
+        start_code_seq, detected_len = [], None
+    if args.start_code != "auto":
+        start_code_len = int(args.start_code)
+    elif detected_len is not None:
+        start_code_len = detected_len
+    else:
+        start_code_len = detect_start_code_len(args.input)
+    start_code = START_CODE_4 if start_code_len == 4 else START_CODE_3
+    start_code_3_count = start_code_seq.count(3)
+    start_code_4_count = len(start_code_seq) - start_code_3_count
 
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     if args.recv_buffer > 0:
@@ -143,10 +406,20 @@ def main():
     effective_buf = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
     sock.bind((args.host, args.port))
     sock.settimeout(0.5)
+    if args.io_uring:
+        receiver = make_uring_receiver(sock, 0.5)
+        if receiver is None:
+            parser.error("--io-uring requires liburing-ffi.so.2 (liburing >= 2.4)")
+    else:
+        receiver = make_batch_receiver(sock, 0.5)
+    recv_batch, close_receiver = receiver
 
-    out = open(args.output, "wb")
+    out = open(args.output, "wb", buffering=0)
+    out_fd = out.fileno()
 
-    fu_buffer = None
+    # Output is batched in wbuf; an FU-A in progress lives at wbuf[fu_start:]
+    wbuf = bytearray()
+    fu_start = None
 
     packets = 0
     bytes_payload = 0
@@ -177,13 +450,8 @@ def main():
     last_report_packets = 0
     report_interval = 0.5
 
-    def next_start_code():
-        nonlocal start_code_index
-        if start_code_index < len(start_code_seq):
-            length = start_code_seq[start_code_index]
-            start_code_index += 1
-            return START_CODE_4 if length == 4 else START_CODE_3
-        return start_code
+    start_code_bytes = tuple(START_CODE_4 if x == 4 else START_CODE_3 for x in start_code_seq)
+    next_start_code = partial(next, iter(start_code_bytes), start_code)
 
     try:
         while True:
@@ -198,125 +466,138 @@ def main():
             ):
                 break
 
-            try:
-                data, _ = sock.recvfrom(65536)
-            except socket.timeout:
+            batch = recv_batch()
+            if not batch:
                 continue
 
-            header = parse_rtp_header(data)
-            if not header or header["version"] != 2:
-                continue
+            for data in batch:
+                header = parse_rtp_header(data)
+                if not header or header["version"] != 2:
+                    continue
 
-            payload = header["payload"]
-            if not payload:
-                continue
+                payload = header["payload"]
+                if not payload:
+                    continue
 
-            seq = header["sequence"]
-            if last_seq is None:
-                last_seq = seq
-            else:
-                delta = (seq - last_seq) & 0xFFFF
-                if delta == 0:
-                    dup_packets += 1
-                elif delta == 1:
-                    pass
-                elif delta < 0x8000:
-                    lost_packets += delta - 1
+                seq = header["sequence"]
+                if last_seq is None:
+                    last_seq = seq
                 else:
-                    out_of_order += 1
-                last_seq = seq
-
-            if capture_start is None:
-                capture_start = now
-                last_report = now
-                last_report_packets = 0
-                sys.stdout.write("Receiving...\n")
-                sys.stdout.flush()
-
-            packets += 1
-            bytes_payload += len(payload)
-            last_packet_time = now
-            if header["marker"]:
-                marker_count += 1
-
-            nal_type = payload[0] & 0x1F
-
-            if nal_type < 24:
-                out.write(next_start_code())
-                out.write(payload)
-                nal_units += 1
-                fu_buffer = None
-
-            elif nal_type == 24:
-                offset = 1
-                while offset + 2 <= len(payload):
-                    nal_len = struct.unpack(">H", payload[offset : offset + 2])[0]
-                    offset += 2
-                    if offset + nal_len > len(payload):
-                        fu_errors += 1
-                        break
-                    nal = payload[offset : offset + nal_len]
-                    offset += nal_len
-                    if nal:
-                        out.write(next_start_code())
-                        out.write(nal)
-                        nal_units += 1
-                        stap_units += 1
+                    delta = (seq - last_seq) & 0xFFFF
+                    if delta == 0:
+                        dup_packets += 1
+                    elif delta == 1:
+                        pass
+                    elif delta < 0x8000:
+                        lost_packets += delta - 1
+                    else:
+                        out_of_order += 1
+                    last_seq = seq
+
+                if capture_start is None:
+                    capture_start = now
+                    last_report = now
+                    last_report_packets = 0
+                    sys.stdout.write("Receiving...\n")
+                    sys.stdout.flush()
+
+                packets += 1
+                bytes_payload += len(payload)
+                last_packet_time = now
+                if header["marker"]:
+                    marker_count += 1
+
+                nal_type = payload[0] & 0x1F
+
+                if nal_type < 24:
+                    if fu_start is not None:
+                        del wbuf[fu_start:]
+                        fu_start = None
+                    wbuf += next_start_code()
+                    wbuf += payload
+                    nal_units += 1
 
-            elif nal_type == 28:
-                if len(payload) < 2:
-                    fu_errors += 1
-                    continue
-                fu_indicator = payload[0]
-                fu_header = payload[1]
-                start = (fu_header >> 7) & 1
-                end = (fu_header >> 6) & 1
-                orig_type = fu_header & 0x1F
-
-                nal_f = fu_indicator & 0x80
-                nal_nri = fu_indicator & 0x60
-                reconstructed_header = bytes([nal_f | nal_nri | orig_type])
-                fragment = payload[2:]
-
-                if start:
-                    fu_buffer = bytearray()
-                    fu_buffer += next_start_code()
-                    fu_buffer += reconstructed_header
-                    fu_buffer += fragment
-                else:
-                    if fu_buffer is None:
+                elif nal_type == 24:
+                    if fu_start is not None:
+                        del wbuf[fu_start:]
+                        fu_start = None
+                    offset = 1
+                    payload_len = len(payload)
+                    while offset + 2 <= payload_len:
+                        (nal_len,) = _U16.unpack_from(payload, offset)
+                        offset += 2
+                        nal_end = offset + nal_len
+                        if nal_end > payload_len:
+                            fu_errors += 1
+                            break
+                        if nal_len:
+                            wbuf += next_start_code()
+                            wbuf += payload[offset:nal_end]
+                            nal_units += 1
+                            stap_units += 1
+                        offset = nal_end
+
+                elif nal_type == 28:
+                    if len(payload) < 2:
                         fu_errors += 1
                         continue
-                    fu_buffer += fragment
+                    fu_indicator = payload[0]
+                    fu_header = payload[1]
+                    start = (fu_header >> 7) & 1
+                    end = (fu_header >> 6) & 1
+                    orig_type = fu_header & 0x1F
+                    fragment = payload[2:]
+
+                    if start:
+                        if fu_start is not None:
+                            del wbuf[fu_start:]
+                        fu_start = len(wbuf)
+                        nal_f = fu_indicator & 0x80
+                        nal_nri = fu_indicator & 0x60
+                        wbuf += next_start_code()
+                        wbuf.append(nal_f | nal_nri | orig_type)
+                        wbuf += fragment
+                    else:
+                        if fu_start is None:
+                            fu_errors += 1
+                            continue
+                        wbuf += fragment
+
+                    if end:
+                        nal_units += 1
+                        fu_complete += 1
+                        fu_start = None
+                else:
+                    fu_errors += 1
 
-                if end and fu_buffer is not None:
-                    out.write(fu_buffer)
-                    nal_units += 1
-                    fu_complete += 1
-                    fu_buffer = None
-            else:
-                fu_errors += 1
-
-            if now - last_report >= report_interval:
-                elapsed = 0.0 if capture_start is None else now - capture_start
-                interval = max(1e-6, now - last_report)
-                pps = (packets - last_report_packets) / interval
-                mb = bytes_payload / (1024 * 1024)
-                line = (
-                    f"\rPackets {packets} | Payload {mb:.2f} MiB | "
-                    f"NAL {nal_units} | Loss {lost_packets} | "
-                    f"OOO {out_of_order} | {pps:6.1f} pkt/s | {elapsed:6.1f}s"
-                )
-                sys.stdout.write(line + " " * max(0, 4))
-                sys.stdout.flush()
-                last_report = now
-                last_report_packets = packets
+                if fu_start is None and len(wbuf) >= WRITE_CHUNK:
+                    write_all(out_fd, wbuf)
+                    wbuf.clear()
+
+                if now - last_report >= report_interval:
+                    elapsed = 0.0 if capture_start is None else now - capture_start
+                    interval = max(1e-6, now - last_report)
+                    pps = (packets - last_report_packets) / interval
+                    mb = bytes_payload / (1024 * 1024)
+                    line = (
+                        f"\rPackets {packets} | Payload {mb:.2f} MiB | "
+                        f"NAL {nal_units} | Loss {lost_packets} | "
+                        f"OOO {out_of_order} | {pps:6.1f} pkt/s | {elapsed:6.1f}s"
+                    )
+                    sys.stdout.write(line + " " * max(0, 4))
+                    sys.stdout.flush()
+                    last_report = now
+                    last_report_packets = packets
 
     except KeyboardInterrupt:
         pass
     finally:
         sys.stdout.write("\n")
+        if fu_start is not None:
+            del wbuf[fu_start:]
+        write_all(out_fd, wbuf)
         out.close()
+        close_receiver()
         sock.close()
 
     input_hash = hash_file(args.input)